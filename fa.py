@@ -1,14 +1,43 @@
-import itertools
 import json
+import logging
+import re
+import sys
 from pathlib import Path
-from collections import defaultdict
-from typing import Optional, DefaultDict
+from collections import defaultdict, deque
+from functools import cached_property
+from itertools import chain, count
+from operator import attrgetter
+from typing import Optional, DefaultDict, Iterable
 
 Transitions = Optional[DefaultDict[str, set["State"]]]
 EpsilonTransitions = Optional[list["State"]]
 
 EPSILON_TRANSITION_TOKEN = "EPS"
 
+EMPTY_MOVE_TABLE = [0] * 256
+
+# Entries of the DFA table, next to the ids of the DFA states. Symbols outside the alphabet get the id 0, whose
+# column is always dead.
+DEAD_STATE = -1
+UNKNOWN_STATE = -2
+UNKNOWN_SYMBOL = 0
+UNKNOWN_SYMBOL_CHARACTER = chr(UNKNOWN_SYMBOL)
+
+# Once the DFA is known to have self-loops, words at least this long are run in chunks of LOOP_SKIPPING_CHUNK symbols,
+# with self-loop skipping between chunks, see NFA.accepts. A state is not skipped over for the rest of a word once one
+# of its runs is shorter than LOOP_SKIPPING_MIN_RUN.
+LOOP_SKIPPING_MIN_LENGTH = 256
+LOOP_SKIPPING_CHUNK = 128
+LOOP_SKIPPING_MIN_RUN = 32
+
+# Only the results of words up to this long are remembered by NFA.accepts, longer ones would pin too much memory.
+RESULT_CACHE_MAX_LENGTH = 64
+
+logger = logging.getLogger(__name__)
+
+# NFAs loaded by NFA.from_json_file, keyed by class and resolved path, with the modification time of the file.
+NFA_CACHE: dict[tuple[type, str], tuple[int, "NFA"]] = {}
+
 
 class State:
     """A representation of a state in a finite automaton.
@@ -23,21 +52,57 @@ class State:
     ----------
     label : str
         Label of this state.
+    id : int
+        Unique, increasing number of this state, in order of creation. Labels are not unique in Thompson's
+        construction, ids are, and give automata a deterministic order of their states.
     transitions : DefaultDict[str, set[State]]
         Outward transitions of this note, a set of states for each character which has a transition.
     epsilon_transitions : list[State]
         Outward epsilon transitions of this node.
 
+    Once a state is frozen, its transitions are a dict of tuples and its epsilon transitions a tuple, and adding
+    transitions to it raises a RuntimeError.
+
     """
+    __slots__ = ("label", "id", "transitions", "epsilon_transitions", "_closure", "_frozen")
+
+    _ids = count()
+
+    # Bumped whenever an epsilon transition is added to any state. A closure depends on the epsilon transitions of
+    # every state it contains, so a cached closure is only valid while this has not changed.
+    _epsilon_version = 0
+
     def __init__(self, label: str, transitions: Transitions = None,
                  epsilon_transitions: EpsilonTransitions = None) -> None:
         self.label = label
+        self.id = next(State._ids)
         self.transitions = transitions if transitions is not None else defaultdict(set)
         self.epsilon_transitions = epsilon_transitions if epsilon_transitions is not None else []
+        self._closure: Optional[tuple[int, set["State"]]] = None
+        self._frozen = False
 
     def __repr__(self) -> str:
-        return "State(label={label})".format(
-            label=self.label, transitions=self.transitions, epsilon_transitions=self.epsilon_transitions)
+        # Only the label is shown, transitions would recurse into the neighbouring states.
+        return "State(label={label})".format(label=self.label)
+
+    @property
+    def frozen(self) -> bool:
+        return self._frozen
+
+    def freeze(self) -> None:
+        """Replaces the containers of the outward transitions with immutable tuples.
+
+        Tuples take less memory than sets and lists and are faster to iterate, which pays off once the automaton is
+        complete and is only read from.
+
+        """
+        self.transitions = {symbol: tuple(states) for symbol, states in self.transitions.items()}
+        self.epsilon_transitions = tuple(self.epsilon_transitions)
+        self._frozen = True
+
+    def __check_not_frozen(self) -> None:
+        if self.frozen:
+            raise RuntimeError("State {label} is frozen and can not get new transitions.".format(label=self.label))
 
     def add_transition(self, symbol: str, state: "State") -> None:
         """Adds one transition to the dict of outward transitions.
@@ -50,6 +115,7 @@ class State:
             State which the new transitions is pointing to.
 
         """
+        self.__check_not_frozen()
         self.transitions[symbol].add(state)
 
     def add_epsilon_transition(self, state: "State") -> None:
@@ -61,7 +127,9 @@ class State:
             State which the new epsilon transitions is pointing to.
 
         """
+        self.__check_not_frozen()
         self.epsilon_transitions.append(state)
+        State._epsilon_version += 1
 
     def add_epsilon_transitions(self, states: list["State"]) -> None:
         """Adds multiple epsilon transitions to the list of epsilon transitions.
@@ -72,7 +140,9 @@ class State:
             List of states of new epsilon transitions.
 
         """
+        self.__check_not_frozen()
         self.epsilon_transitions.extend(states)
+        State._epsilon_version += 1
 
     def get_epsilon_closure(self) -> set["State"]:
         """Creates a set of all the states (including this one),
@@ -83,18 +153,153 @@ class State:
         set[State]
             Set of states reached by following epsilon transitions. This state is also included.
         """
-        return {self, *self.epsilon_transitions,
-                *list(itertools.chain(*[e.get_epsilon_closure() for e in self.epsilon_transitions]))}
+        if self._closure is None or self._closure[0] != State._epsilon_version:
+            closure = {self}
+            work_list = deque([self])
+
+            while work_list:
+                for t in work_list.popleft().epsilon_transitions:
+                    if t not in closure:
+                        closure.add(t)
+                        work_list.append(t)
+
+            self._closure = (State._epsilon_version, closure)
+
+        return set(self._closure[1])
+
+
+def find_epsilon_components(states: Iterable[State]) -> list[set[State]]:
+    """Finds the strongly connected components of the epsilon-only subgraph, using Tarjan's algorithm.
+
+    The depth-first search is iterative, so long epsilon chains do not run into the recursion limit. All the states of
+    a component reach each other through epsilon transitions, therefore they share the same epsilon closure.
+
+    Parameters
+    ----------
+    states : Iterable[State]
+        States of an automaton, closed under epsilon transitions. The search starts from them in this order.
+
+    Returns
+    -------
+    list[set[State]]
+        Components in reverse topological order, i.e. every component comes after all the components it reaches.
+    """
+    indices = {}
+    low_links = {}
+    stack = []
+    on_stack = set()
+    components = []
+
+    for root in states:
+        if root in indices:
+            continue
+
+        indices[root] = low_links[root] = len(indices)
+        stack.append(root)
+        on_stack.add(root)
+        call_stack = [(root, iter(root.epsilon_transitions))]
+
+        while call_stack:
+            s, successors = call_stack[-1]
+
+            for t in successors:
+                if t not in indices:
+                    indices[t] = low_links[t] = len(indices)
+                    stack.append(t)
+                    on_stack.add(t)
+                    call_stack.append((t, iter(t.epsilon_transitions)))
+
+                    break
+
+                if t in on_stack:
+                    low_links[s] = min(low_links[s], indices[t])
+            else:
+                call_stack.pop()
+
+                if call_stack:
+                    parent = call_stack[-1][0]
+                    low_links[parent] = min(low_links[parent], low_links[s])
+
+                if low_links[s] == indices[s]:
+                    component = set()
+
+                    while True:
+                        t = stack.pop()
+                        on_stack.discard(t)
+                        component.add(t)
+
+                        if t is s:
+                            break
+
+                    components.append(component)
+
+    return components
+
+
+def compute_epsilon_closures(states: set[State],
+                             components: Optional[list[set[State]]] = None) -> dict[State, set[State]]:
+    """Computes the epsilon closures of all the given states in a single pass.
+
+    The epsilon-only subgraph is condensed into its strongly connected components, which are visited bottom-up: the
+    closure of a component is its own states plus the closures of the components it has an epsilon transition to,
+    all of which are already known at that point. This is linear in the size of the graph, whatever its cycles.
+
+    Parameters
+    ----------
+    states : set[State]
+        States of an automaton, closed under epsilon transitions.
+    components : list[set[State]], optional
+        Epsilon components of the states, as returned by find_epsilon_components. Found here if not given.
+
+    Returns
+    -------
+    dict[State, set[State]]
+        Epsilon closure of each state, the state itself included. States of the same component share one set.
+    """
+    closures = {}
+
+    for component in components if components is not None else find_epsilon_components(states):
+        closure = set(component)
+
+        for t in chain.from_iterable(s.epsilon_transitions for s in component):
+            if t not in component:
+                closure |= closures[t]
+
+        for s in component:
+            closures[s] = closure
+
+    return closures
+
+
+class SymbolTranslation(dict):
+    """Translation table for str.translate, mapping every symbol of an alphabet to the character of its id.
+
+    Any other character is mapped to the character of UNKNOWN_SYMBOL.
+    """
+    def __missing__(self, key: int) -> str:
+        return UNKNOWN_SYMBOL_CHARACTER
 
 
 class NFA:
+    # Upper bound on the number of DFA states kept by the lazy subset construction. Once it is reached, the DFA is
+    # flushed and rebuilt from the states which are still needed, so automata whose DFA blows up keep running on their
+    # bitmasks in bounded memory.
+    dfa_cache_size = 10000
+    # Upper bound on the number of words whose results are remembered by accepts. The results are dropped all at once
+    # when it is reached, 0 turns the cache off.
+    result_cache_size = 1024
+
     def __init__(self, states: set[State], alphabet: set[str], initial_state: State, accepting_states: set[State]):
         self.states = states
-        self.alphabet = alphabet
+        # Frozen, so that NFAs combined by Thompson's construction can share their alphabets. This does not copy an
+        # alphabet which already is a frozenset.
+        self.alphabet = frozenset(alphabet)
         self.initial_state = initial_state
         self.accepting_states = accepting_states
 
-        self.epsilon_closures = self.__create_epsilon_closures()
+        # Everything accepts needs is compiled on its first call: Thompson's construction builds an NFA for every
+        # operator of a regex, and only the last one is ever run.
+        self._dfa_table: Optional[list[int]] = None
 
     def __repr__(self) -> str:
         return "NFA(states={states}, alphabet={alphabet}, initial_state={initial_state}, " \
@@ -102,35 +307,490 @@ class NFA:
                                                              initial_state=self.initial_state,
                                                              accepting_states=self.accepting_states)
 
+    @cached_property
+    def epsilon_closures(self) -> dict[State, set[State]]:
+        """Epsilon closure of each state of this NFA, the state itself included.
+
+        Compiling does not keep the closures it uses, they are computed on the first access and kept from then on.
+        """
+        return compute_epsilon_closures(self.states)
+
     @classmethod
     def from_json_file(cls, filepath: Path) -> "NFA":
+        """Loads an NFA from a JSON file.
+
+        Loaded automata are cached by resolved path, along with the modification time of the file, so loading an
+        unchanged file again returns the same, already compiled NFA. The NFA is frozen, therefore it is safe to share.
+
+        Parameters
+        ----------
+        filepath : Path
+            Path of the JSON file.
+
+        Returns
+        -------
+        NFA
+            NFA described by the file.
+        """
+        filepath = Path(filepath)
+        key = (cls, str(filepath.resolve()))
+        modified = filepath.stat().st_mtime_ns
+        cached = NFA_CACHE.get(key)
+
+        if cached is None or cached[0] != modified:
+            cached = NFA_CACHE[key] = (modified, cls.__load_json_file(filepath))
+
+        return cached[1]
+
+    @classmethod
+    def __load_json_file(cls, filepath: Path) -> "NFA":
         with open(filepath, 'r') as f:
             data = json.load(f)
 
-            states = {s: State(s) for s in data["states"]}
+            # Labels and symbols are interned, so that the many copies of them in the file share a single string
+            # each, whose hash is computed once.
+            states = {s: State(s) for s in map(sys.intern, data["states"])}
             accepting_states = {states[s] for s in data["accepting_states"]}
 
             for t in data["transitions"]:
-                if t["symbol"] == EPSILON_TRANSITION_TOKEN:
+                symbol = sys.intern(t["symbol"])
+
+                if symbol == EPSILON_TRANSITION_TOKEN:
                     states[t["from"]].add_epsilon_transition(states[t["to"]])
                 else:
-                    states[t["from"]].add_transition(t["symbol"], states[t["to"]])
+                    states[t["from"]].add_transition(symbol, states[t["to"]])
+
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Loaded %d states from %s.", len(states), filepath)
 
-            print(states.values())
+            nfa = cls(states=set(states.values()),
+                      alphabet=set(map(sys.intern, data["alphabet"])),
+                      initial_state=states[data["initial_state"]],
+                      accepting_states=accepting_states)
+            nfa.freeze()
 
-            return cls(states=set(states.values()),
-                       alphabet=set(data["alphabet"]),
-                       initial_state=states[data["initial_state"]],
-                       accepting_states=accepting_states)
+            return nfa
+
+    def freeze(self) -> None:
+        """Freezes all the states of this NFA, see State.freeze.
+
+        This is not done on construction since Thompson's construction keeps adding epsilon transitions to the
+        states of NFAs which have already been built, it should be called once an NFA is complete.
+        """
+        for s in self.states:
+            s.freeze()
 
     def accepts(self, input_str: str) -> bool:
-        current_states = {self.initial_state}
+        """Checks whether this NFA accepts a word.
+
+        The word is run on an equivalent DFA which is built lazily: a DFA transition is computed from the bitmask
+        subsets the first time it is taken and cached from then on, so repeated subsets cost a single lookup. The word
+        is first translated to symbol ids, which index the rows of the DFA table. Long words skip over runs of
+        self-loops in bulk. A missing transition leads to the (implicit) dead state, in which case the word is rejected
+        right away. The result of a short word is remembered, so checking it again costs a single lookup.
+
+        Parameters
+        ----------
+        input_str : str
+            Word to be checked.
+
+        Returns
+        -------
+        bool
+            True if the NFA ends up in at least one accepting state after reading the word, False otherwise.
+        """
+        if self._dfa_table is None:
+            self.__compile()
+
+        if not self.result_cache_size or len(input_str) > RESULT_CACHE_MAX_LENGTH:
+            return self.__run(input_str)
+
+        results = self._results
+        accepted = results.get(input_str)
+
+        if accepted is None:
+            if len(results) >= self.result_cache_size:
+                results.clear()
+
+            accepted = results[input_str] = self.__run(input_str)
+
+        return accepted
+
+    def __run(self, input_str: str) -> bool:
+        """Runs a word on the lazy DFA, see accepts."""
+        if not input_str.startswith(self._prefix):
+            return False
+
+        translated = input_str.translate(self._symbol_translation)
+
+        # The column of the unknown symbol is dead, so a word with a symbol outside the alphabet is rejected by a
+        # single scan in C.
+        if UNKNOWN_SYMBOL_CHARACTER in translated:
+            return False
+
+        if self._dfa_stride > 256:
+            symbol_ids = map(ord, translated)
+        else:
+            # Iterating over bytes yields the symbol ids as ints, without calling ord on every character.
+            symbol_ids = translated.encode("latin-1")
+
+            if self._dfa_has_loops and len(symbol_ids) >= LOOP_SKIPPING_MIN_LENGTH:
+                return self.__accepts_skipping_loops(symbol_ids)
+
+        table, add_transition = self._dfa_table, self.__add_dfa_transition
+        state = 0
+
+        # The step keeps a single lookup and a single branch per symbol, the previous state is only needed to fill in
+        # a transition that has not been computed yet.
+        for b in symbol_ids:
+            previous, state = state, table[state + b]
+
+            if state < 0:
+                if state == DEAD_STATE:
+                    return False
+
+                state = add_transition(previous, b)
+
+                if state < 0:
+                    return False
+
+        return bool(self._dfa_accepting[state // self._dfa_stride])
+
+    def __accepts_skipping_loops(self, symbol_ids: bytes) -> bool:
+        """Runs a long word, translated to symbol ids, on the lazy DFA, skipping over long runs of self-loops.
+
+        The word is stepped through in chunks of LOOP_SKIPPING_CHUNK symbols, just like in accepts. When a chunk ends
+        on a self-loop, the rest of the run is skipped with a single regex match against the symbols the state is known
+        to loop on, which scans in C. A state whose run turns out shorter than LOOP_SKIPPING_MIN_RUN is not matched
+        again for the rest of the word.
+        """
+        table, add_transition, loops = self._dfa_table, self.__add_dfa_transition, self._dfa_loops
+        state = previous = i = 0
+        n = len(symbol_ids)
+        unproductive = set()
+
+        while i < n:
+            for b in symbol_ids[i:i + LOOP_SKIPPING_CHUNK]:
+                previous, state = state, table[state + b]
+
+                if state < 0:
+                    if state == DEAD_STATE:
+                        return False
+
+                    state = add_transition(previous, b)
+
+                    if state < 0:
+                        return False
+
+            i += LOOP_SKIPPING_CHUNK
+
+            if state == previous and state not in unproductive and i < n:
+                loop = loops.get(state)
+
+                if loop is None:
+                    loop = loops[state] = self.__create_loop_pattern(state)
+
+                end = loop.match(symbol_ids, i).end()
+
+                if end - i < LOOP_SKIPPING_MIN_RUN:
+                    unproductive.add(state)
+
+                i = end
+
+        return bool(self._dfa_accepting[state // self._dfa_stride])
+
+    def accepts_many(self, input_strs: Iterable[str]) -> list[bool]:
+        """Checks whether this NFA accepts each word of a batch.
+
+        Distinct words are run in sorted order and each one resumes from the DFA states the previous one went through
+        along their common prefix, so prefixes shared by the batch (e.g. the words of a vocabulary) are read once.
+
+        Parameters
+        ----------
+        input_strs : Iterable[str]
+            Words to be checked.
+
+        Returns
+        -------
+        list[bool]
+            Whether each word is accepted, in the order of the batch.
+        """
+        input_strs = list(input_strs)
+        if self._dfa_table is None:
+            self.__compile()
+
+        table, add_transition = self._dfa_table, self.__add_dfa_transition
+        results = {}
+        previous = ""
+        path = [0]
+
+        for w in sorted(set(input_strs)):
+            generation = self._dfa_generation
+            common = 0
+
+            for a, b in zip(previous, w):
+                if a != b:
+                    break
+
+                common += 1
+
+            # The path stops at the dead state, in which case it may be shorter than the common prefix.
+            del path[common + 1:]
+            state = path[-1]
+
+            if state >= 0:
+                for b in map(ord, w[len(path) - 1:].translate(self._symbol_translation)):
+                    following = table[state + b]
+
+                    if following == UNKNOWN_STATE:
+                        following = add_transition(state, b)
+
+                    path.append(following)
+                    state = following
+
+                    if state < 0:
+                        break
+
+            results[w] = state >= 0 and bool(self._dfa_accepting[state // self._dfa_stride])
+            previous = w
+
+            if self._dfa_generation != generation:
+                # The DFA was flushed while reading the word, the states along its path are gone.
+                previous = ""
+                path = [0]
+
+        return [results[w] for w in input_strs]
+
+    def __compile(self) -> None:
+        """Builds the bitmask representation of this NFA and the initial state of its lazy DFA."""
+        # Sorted so that the indices of the states, and in turn the DFA, do not depend on the iteration order of a set.
+        ordered = sorted(self.states, key=attrgetter("id"))
+
+        if any(s.epsilon_transitions for s in ordered):
+            components = find_epsilon_components(ordered)
+            closures = compute_epsilon_closures(self.states, components)
+        else:
+            # Without any epsilon transition, every state is a component and a closure of its own.
+            components = [{s} for s in ordered]
+            closures = {s: {s} for s in ordered}
+
+        # States of the same epsilon component are interchangeable once the closures are folded into the moves, so
+        # they share a single index and the bitmasks only have one bit per component. The indices and the closures are
+        # only needed here, what is kept afterwards is indexed by bit.
+        indices = {s: i for i, c in enumerate(components) for s in c}
+        self._index_count = len(components)
+        # The move masks of a symbol are dropped once its move tables are built.
+        self._move_masks = self.__create_move_masks(components, indices, closures)
+        self._accepting_mask = self.__create_mask({s for s, c in closures.items()
+                                                   if not c.isdisjoint(self.accepting_states)}, indices)
+        self._move_tables: dict[str, list[list[int]]] = {}
+
+        # Only single characters can be matched by accepts, which reads words character by character.
+        self._symbols = [None, *sorted(a for a in self.alphabet if len(a) == 1)]
+        self._symbol_translation = SymbolTranslation({ord(a): chr(i) for i, a in enumerate(self._symbols) if i})
+
+        self._initial_mask = 1 << indices[self.initial_state]
+        # The DFA table is flat and row-major, with one row of len(self._symbols) entries per DFA state. States are
+        # identified by the offset of their row, so that a transition is found at table[state + symbol_id]. It is a
+        # list rather than an array: its entries are the ints interned in self._dfa_states or the sentinels, so they
+        # cost a pointer each, while an array would have to box an int on every lookup of the step loop.
+        self._dfa_stride = len(self._symbols)
+        self._dfa_row = [DEAD_STATE if i == UNKNOWN_SYMBOL else UNKNOWN_STATE for i in range(self._dfa_stride)]
+        self._dfa_generation = 0
+        self._dfa_states: dict[int, int] = {}
+        self._dfa_masks: list[int] = []
+        self._dfa_table = []
+        # Entry i is 1 if the i-th DFA state is accepting, 0 otherwise.
+        self._dfa_accepting = bytearray()
+        self._dfa_loops: dict[int, re.Pattern] = {}
+        self._dfa_has_loops = False
+        self.__add_dfa_state(self._initial_mask)
+        self._prefix = self.__find_prefix()
+
+        # Results of accepts by word. They do not depend on the DFA, so they outlive its flushes.
+        self._results: dict[str, bool] = {}
+
+    def __find_prefix(self) -> str:
+        """Finds the literal prefix shared by all the words this NFA accepts, so that accepts can check it up front.
+
+        The prefix is followed from the initial subset for as long as the current subset is not accepting and only a
+        single symbol leads out of it. It stops at a subset seen before, since the prefix would repeat forever. The moves
+        are read off the move masks, so that no move table is built before accepts needs it.
+        """
+        symbols = set(self._symbols[1:])
+        prefix = []
+        mask = self._initial_mask
+        seen = set()
+
+        while not mask & self._accepting_mask and mask not in seen:
+            seen.add(mask)
+            moves = []
+
+            for symbol, (sources, masks) in self._move_masks.items():
+                if symbol not in symbols:
+                    continue
+
+                following = 0
+
+                for i, m in zip(sources, masks):
+                    if mask >> i & 1:
+                        following |= m
+
+                if following:
+                    moves.append((symbol, following))
+
+            if len(moves) != 1:
+                break
+
+            symbol, mask = moves[0]
+            prefix.append(symbol)
+
+        return "".join(prefix)
+
+    def __move(self, mask: int, symbol: str) -> int:
+        """Computes the set of states entered from a set of states (and their epsilon closures) on a symbol.
+
+        The mask is processed a byte, i.e. eight states, at a time: each non-zero byte is looked up in the move table
+        of its chunk, so a subset costs one lookup per non-zero byte instead of one Python iteration per state.
+        """
+        tables = self._move_tables.get(symbol)
+
+        if tables is None:
+            if symbol not in self._move_masks:
+                return 0
+
+            tables = self._move_tables[symbol] = self.__create_move_tables(symbol)
+
+        following = 0
+
+        for table, b in zip(tables, mask.to_bytes(len(tables), "little")):
+            if b:
+                following |= table[b]
+
+        return following
+
+    def __add_dfa_state(self, mask: int) -> int:
+        """Interns a subset of NFA states as a DFA state.
+
+        Every DFA state is an int mask of NFA states, whose epsilon closures are left implicit, identified by the
+        offset of its row in the DFA table, with 0 being the initial state. Rows are added in the order of discovery.
+        Empty masks never get a row, they are the dead state.
+        """
+        state = self._dfa_states.get(mask)
+
+        if state is None:
+            state = self._dfa_states[mask] = len(self._dfa_table)
+            self._dfa_masks.append(mask)
+            self._dfa_table.extend(self._dfa_row)
+            self._dfa_accepting.append(1 if mask & self._accepting_mask else 0)
+
+        return state
+
+    def __add_dfa_transition(self, state: int, symbol_id: int) -> int:
+        symbol = self._symbols[symbol_id]
+        mask = self._dfa_masks[state // self._dfa_stride]
+        following = self.__move(mask, symbol)
+
+        if not following:
+            following = DEAD_STATE
+        elif following not in self._dfa_states and len(self._dfa_masks) >= self.dfa_cache_size:
+            # The source state does not survive the flush, so the transition is not recorded.
+            self.__clear_dfa()
+
+            return self.__add_dfa_state(following)
+        else:
+            following = self.__add_dfa_state(following)
+
+        self._dfa_table[state + symbol_id] = following
+
+        if following == state:
+            self._dfa_has_loops = True
+            self._dfa_loops.pop(state, None)
+
+        return following
+
+    def __create_loop_pattern(self, state: int) -> re.Pattern:
+        """Compiles a regex matching runs of the symbol ids, as bytes, on which a DFA state is known to loop."""
+        row = self._dfa_table[state:state + self._dfa_stride]
+        symbol_ids = bytes(b for b, following in enumerate(row) if following == state)
+
+        return re.compile(b"[" + re.escape(symbol_ids) + b"]*" if symbol_ids else b"")
+
+    def __clear_dfa(self) -> None:
+        # Cleared in place, since accepts holds on to the table while it runs.
+        self._dfa_generation += 1
+        self._dfa_states.clear()
+        self._dfa_loops.clear()
+        self._dfa_has_loops = False
+        del self._dfa_masks[:]
+        del self._dfa_table[:]
+        del self._dfa_accepting[:]
+        self.__add_dfa_state(self._initial_mask)
+
+    @staticmethod
+    def __create_mask(states: set[State], indices: dict[State, int]) -> int:
+        mask = 0
+
+        for s in states:
+            mask |= 1 << indices[s]
+
+        return mask
+
+    def __create_move_tables(self, symbol: str) -> list[list[int]]:
+        """Splits the move masks of a symbol into chunks of eight states.
+
+        Entry b of the table of chunk k is the OR of the move masks of the states 8k + j, for every bit j set in b.
+        Chunks without any transition on the symbol share one all-zero table.
+        """
+        sources, masks = self._move_masks.pop(symbol)
+        chunks = [[0] * 8 for _ in range((self._index_count + 7) // 8)]
+
+        for i, mask in zip(sources, masks):
+            chunks[i >> 3][i & 7] |= mask
+
+        tables = []
+
+        for chunk in chunks:
+            if not any(chunk):
+                tables.append(EMPTY_MOVE_TABLE)
+
+                continue
+
+            table = [0] * 256
+
+            for b in range(1, 256):
+                lowest = b & -b
+                table[b] = table[b ^ lowest] | chunk[lowest.bit_length() - 1]
+
+            tables.append(table)
+
+        return tables
+
+    def __create_move_masks(self, components: list[set[State]], indices: dict[State, int],
+                            closures: dict[State, set[State]]) -> dict[str, tuple[list[int], list[int]]]:
+        """Flattens the transitions into two parallel lists per symbol.
+
+        The epsilon closures are folded into the source side: a state gets the transitions of every state in its
+        closure, so the DFA subsets only hold the states entered on a symbol (plus the initial state) and no epsilon
+        transition is followed while stepping. The target masks of each state are built once and ORed together per
+        component and symbol, so for every symbol the first list holds the index of a component and the second one
+        the mask of all the states it enters on that symbol. Components without transitions on a symbol take no space
+        for it.
+        """
+        target_masks = {s: {symbol: self.__create_mask(targets, indices) for symbol, targets in s.transitions.items()}
+                        for s in self.states if s.transitions}
+        move_masks = defaultdict(lambda: ([], []))
+
+        for i, component in enumerate(components):
+            folded = defaultdict(int)
 
-        for s in input_str:
-            current_states = {t for c in current_states for e in self.epsilon_closures[c.label] for t in
-                              e.transitions.get(s, {})}
+            for r in closures[next(iter(component))]:
+                for symbol, mask in target_masks.get(r, {}).items():
+                    folded[symbol] |= mask
 
-        return not current_states.isdisjoint(self.accepting_states)
+            for symbol, mask in folded.items():
+                sources, masks = move_masks[symbol]
+                sources.append(i)
+                masks.append(mask)
 
-    def __create_epsilon_closures(self):
-        return {s.label: s.get_epsilon_closure() for s in self.states}
\ No newline at end of file
+        return dict(move_masks)
\ No newline at end of file
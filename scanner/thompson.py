@@ -1,4 +1,4 @@
-from collections import deque
+from typing import Callable, TypeVar
 
 from fa import NFA, State
 
@@ -10,6 +10,8 @@ ALTERNATION = "|"
 CLOSURE = "*"
 OPERATORS = {ALTERNATION, CLOSURE}
 SPECIAL_CHARS = OPERATORS.union({LPAREN, RPAREN, CONCATENATION})
+NO_CONCATENATION_AFTER = frozenset({LPAREN, ALTERNATION})
+NO_CONCATENATION_BEFORE = frozenset(OPERATORS.union({RPAREN}))
 PRECEDENCE = {
     CLOSURE: 1,
     CONCATENATION: 2,
@@ -18,6 +20,13 @@ PRECEDENCE = {
     RPAREN: 4
 }
 
+# Sub-expression of Glushkov's construction: whether it matches the empty word, the positions it can start with, along
+# with their symbols, and the positions it can end with.
+GlushkovOperand = tuple[bool, set[tuple[str, State]], set[State]]
+
+# Operand of evaluate_postfix, an NFA for Thompson's construction and a GlushkovOperand for Glushkov's.
+Operand = TypeVar("Operand")
+
 
 def format_regex(regex: str) -> str:
     """Formats a regex by inserting an explicit concatenation operator.
@@ -32,11 +41,23 @@ def format_regex(regex: str) -> str:
     str
         Formatted regex with explicit concatenation operators, where appropriate.
     """
-    def should_concatenate(a, b):
-        return a != LPAREN and b != RPAREN and a != ALTERNATION and b not in OPERATORS
+    no_concatenation_after, no_concatenation_before = NO_CONCATENATION_AFTER, NO_CONCATENATION_BEFORE
+    output = []
+    append = output.append
+    characters = iter(regex)
+    previous = next(characters, "")
+
+    for c in characters:
+        append(previous)
+
+        if previous not in no_concatenation_after and c not in no_concatenation_before:
+            append(CONCATENATION)
+
+        previous = c
+
+    append(previous)
 
-    return "".join([c + "." if i + 1 < len(regex) and should_concatenate(c, regex[i + 1])
-                    else c for i, c in enumerate(regex)])
+    return "".join(output)
 
 
 def convert_to_postfix(regex: str) -> str:
@@ -56,51 +77,88 @@ def convert_to_postfix(regex: str) -> str:
     -------
     str
         Regex converted to postfix notation.
+
+    Raises
+    ------
+    ValueError
+        If the parentheses of the regex are unbalanced.
     """
-    output = deque()
+    special_chars, precedence = SPECIAL_CHARS, PRECEDENCE
+    output = []
+    append = output.append
     operators = []
 
     for c in regex:
-        if c not in SPECIAL_CHARS:
-            output.append(c)
+        if c not in special_chars:
+            append(c)
         elif c == LPAREN:
             operators.append(c)
         elif c == RPAREN:
             while True:
+                if not operators:
+                    raise ValueError("Unbalanced {rparen} in {regex}.".format(rparen=RPAREN, regex=regex))
+
                 o = operators.pop()
 
                 if o == LPAREN:
                     break
 
-                output.append(o)
+                append(o)
         else:
-            while True:
-                if operators and PRECEDENCE[operators[-1]] <= PRECEDENCE[c]:
-                    output.append(operators.pop())
-                else:
-                    operators.append(c)
+            p = precedence[c]
 
-                    break
+            while operators and precedence[operators[-1]] <= p:
+                append(operators.pop())
 
-    output.extend(operators[::-1])
+            operators.append(c)
+
+    if LPAREN in operators:
+        raise ValueError("Unbalanced {lparen} in {regex}.".format(lparen=LPAREN, regex=regex))
+
+    output.extend(reversed(operators))
 
     return "".join(output)
 
 
+def merge_alphabets(first: frozenset[str], second: frozenset[str]) -> frozenset[str]:
+    """Merges the alphabets of two NFAs, reusing one of them if it already contains the other one.
+
+    Parameters
+    ----------
+    first : frozenset[str]
+        Alphabet of the first NFA.
+    second : frozenset[str]
+        Alphabet of the second NFA.
+
+    Returns
+    -------
+    frozenset[str]
+        Union of the two alphabets.
+    """
+    if second <= first:
+        return first
+
+    if first <= second:
+        return second
+
+    return first | second
+
+
 def build_symbol_nfa(s: str) -> NFA:
     initial, accepting = State("initial_{symbol}".format(symbol=s)), State("accepting_{symbol}".format(symbol=s))
 
     initial.add_transition(s, accepting)
 
-    return NFA(states={initial, accepting}, alphabet={s}, initial_state=initial, accepting_states={accepting})
+    return NFA(states={initial, accepting}, alphabet=frozenset((s,)), initial_state=initial,
+               accepting_states={accepting})
 
 
 def build_concatenation_nfa(first: NFA, second: NFA) -> NFA:
     for s in first.accepting_states:
         s.add_epsilon_transition(second.initial_state)
 
-    return NFA(states=first.states.union(second.states),
-               alphabet=first.alphabet.union(second.alphabet),
+    return NFA(states={*first.states, *second.states},
+               alphabet=merge_alphabets(first.alphabet, second.alphabet),
                initial_state=first.initial_state,
                accepting_states=second.accepting_states)
 
@@ -110,12 +168,11 @@ def build_union_nfa(first: NFA, second: NFA) -> NFA:
                                epsilon_transitions=[first.initial_state, second.initial_state]), \
                          State("accepting_union")
 
-    for sf, ss in zip(first.accepting_states, second.accepting_states):
-        sf.add_epsilon_transition(accepting)
-        ss.add_epsilon_transition(accepting)
+    for s in {*first.accepting_states, *second.accepting_states}:
+        s.add_epsilon_transition(accepting)
 
-    return NFA(states=first.states.union(second.states).union({initial, accepting}),
-               alphabet=first.alphabet.union(second.alphabet),
+    return NFA(states={*first.states, *second.states, initial, accepting},
+               alphabet=merge_alphabets(first.alphabet, second.alphabet),
                initial_state=initial,
                accepting_states={accepting})
 
@@ -127,7 +184,164 @@ def build_closure_nfa(source: NFA) -> NFA:
     for s in source.accepting_states:
         s.add_epsilon_transitions([source.initial_state, accepting])
 
-    return NFA(states=source.states.union({initial, accepting}),
+    return NFA(states={*source.states, initial, accepting},
                alphabet=source.alphabet,
                initial_state=initial,
                accepting_states={accepting})
+
+
+BUILDERS = {
+    CONCATENATION: (build_concatenation_nfa, 2),
+    ALTERNATION: (build_union_nfa, 2),
+    CLOSURE: (build_closure_nfa, 1)
+}
+
+
+def build_glushkov_concatenation(first: GlushkovOperand, second: GlushkovOperand) -> GlushkovOperand:
+    first_nullable, first_first, first_last = first
+    second_nullable, second_first, second_last = second
+
+    for s in first_last:
+        for symbol, t in second_first:
+            s.add_transition(symbol, t)
+
+    return first_nullable and second_nullable, \
+        first_first | second_first if first_nullable else first_first, \
+        first_last | second_last if second_nullable else second_last
+
+
+def build_glushkov_union(first: GlushkovOperand, second: GlushkovOperand) -> GlushkovOperand:
+    return first[0] or second[0], first[1] | second[1], first[2] | second[2]
+
+
+def build_glushkov_closure(source: GlushkovOperand) -> GlushkovOperand:
+    _, first, last = source
+
+    for s in last:
+        for symbol, t in first:
+            s.add_transition(symbol, t)
+
+    return True, first, last
+
+
+GLUSHKOV_BUILDERS = {
+    CONCATENATION: (build_glushkov_concatenation, 2),
+    ALTERNATION: (build_glushkov_union, 2),
+    CLOSURE: (build_glushkov_closure, 1)
+}
+
+
+def evaluate_postfix(regex: str, builders: dict[str, tuple[Callable[..., Operand], int]],
+                     push_symbol: Callable[[str], Operand]) -> Operand:
+    """Evaluates a regex in postfix notation with a stack of operands.
+
+    The regex is formatted and converted to postfix notation first. Every symbol pushes the operand built for it by
+    push_symbol and every operator pops its operands off the top of the stack and pushes the result of its builder,
+    which is looked up in a table along with the number of operands it takes.
+
+    Parameters
+    ----------
+    regex : str
+        Infix regex.
+    builders : dict[str, tuple[Callable[..., Operand], int]]
+        Builder and arity of each operator.
+    push_symbol : Callable[[str], Operand]
+        Builds the operand of a symbol.
+
+    Returns
+    -------
+    Operand
+        The single operand the regex reduces to.
+
+    Raises
+    ------
+    ValueError
+        If an operator is missing an operand or the regex does not reduce to a single operand.
+    """
+    stack = []
+
+    for c in convert_to_postfix(format_regex(regex)):
+        entry = builders.get(c)
+
+        if entry is None:
+            stack.append(push_symbol(c))
+        else:
+            builder, arity = entry
+
+            if len(stack) < arity:
+                raise ValueError("Operator {operator} is missing an operand in {regex}.".format(operator=c,
+                                                                                               regex=regex))
+
+            operands = stack[-arity:]
+            del stack[-arity:]
+            stack.append(builder(*operands))
+
+    if len(stack) != 1:
+        raise ValueError("Regex {regex} does not reduce to a single operand.".format(regex=regex))
+
+    return stack.pop()
+
+
+def create_nfa(regex: str) -> NFA:
+    """Creates an NFA from a regex, using Thompson's construction.
+
+    The postfix regex is evaluated with a stack of NFAs, see evaluate_postfix: every symbol pushes its basic NFA and
+    every operator combines the NFAs of its operands. The resulting NFA is complete, therefore it is frozen.
+
+    Parameters
+    ----------
+    regex : str
+        Infix regex.
+
+    Returns
+    -------
+    NFA
+        NFA recognizing the language of the regex.
+    """
+    nfa = evaluate_postfix(regex, BUILDERS, build_symbol_nfa)
+    nfa.freeze()
+
+    return nfa
+
+
+def create_glushkov_nfa(regex: str) -> NFA:
+    """Creates an NFA without epsilon transitions from a regex, using Glushkov's construction.
+
+    Every symbol of the regex is a position, i.e. a state entered on that symbol, plus a single initial state. The
+    postfix regex is evaluated with a stack of (nullable, first, last) triples, see evaluate_postfix, where first holds
+    the positions a sub-expression can start with, along with their symbols, and last the positions it can end with.
+    Concatenation and closure link last positions to first positions as they are evaluated, which builds the follow
+    relation in place. The resulting NFA has one state per symbol plus one and no epsilon transitions, so its closures
+    are trivial.
+
+    Parameters
+    ----------
+    regex : str
+        Infix regex.
+
+    Returns
+    -------
+    NFA
+        NFA recognizing the language of the regex.
+    """
+    positions = []
+
+    def build_position(c: str) -> GlushkovOperand:
+        position = State("position_{symbol}".format(symbol=c))
+        positions.append((c, position))
+
+        return False, {(c, position)}, {position}
+
+    nullable, first, last = evaluate_postfix(regex, GLUSHKOV_BUILDERS, build_position)
+    initial = State("initial")
+
+    for symbol, t in first:
+        initial.add_transition(symbol, t)
+
+    nfa = NFA(states={initial, *(t for _, t in positions)},
+              alphabet={symbol for symbol, _ in positions},
+              initial_state=initial,
+              accepting_states={initial, *last} if nullable else set(last))
+    nfa.freeze()
+
+    return nfa
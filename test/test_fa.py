@@ -1,17 +1,30 @@
+import os
+import shutil
+import tempfile
 import unittest
+from unittest import mock
 from pathlib import Path
-from fa import NFA
+from fa import NFA, State
+
+NFA_FILEPATH = Path(__file__).parent.joinpath("resources", "nfa.json")
 
 
 class TestNFA(unittest.TestCase):
+    def copy_nfa_file(self) -> Path:
+        """Copies the NFA file to a temporary directory, so that loading it does not return the NFA shared through the
+        cache of NFA.from_json_file, whose tunables must be left alone."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+
+        return Path(shutil.copy(NFA_FILEPATH, directory.name))
+
     def test_accepts(self):
         test_data = {
             "valid_words": ["ab", "aab"],
             "invalid_words": ["aba", "abab", "aabaab", "invalid"]
         }
 
-        filepath = Path(__file__).parent.joinpath("resources", "nfa.json")
-        nfa = NFA.from_json_file(filepath)
+        nfa = NFA.from_json_file(NFA_FILEPATH)
 
         for w in test_data["valid_words"]:
             with self.subTest("Should have validated the word.", w=w):
@@ -20,3 +33,130 @@ class TestNFA(unittest.TestCase):
         for w in test_data["invalid_words"]:
             with self.subTest("Should not have validated the word", w=w):
                 self.assertFalse(nfa.accepts(w))
+
+    def test_accepts_long_words(self):
+        nfa = NFA.from_json_file(NFA_FILEPATH)
+
+        for w, e in [("a" * 1000 + "b", True), ("a" * 1000 + "ba", False), ("a" * 1000, False), ("ab" * 500, False),
+                     ("a" * 255 + "b", True), ("a" * 300 + "b" * 100, False)]:
+            with self.subTest("Should have skipped over the self-loops correctly.", length=len(w)):
+                self.assertEqual(nfa.accepts(w), e)
+
+    def test_dfa_cache_size(self):
+        words = ["ab", "aba", "aab", "abab", "", "aab", "aaaab", "invalid"]
+        expected = [True, False, True, False, False, True, True, False]
+
+        nfa = NFA.from_json_file(self.copy_nfa_file())
+        nfa.dfa_cache_size = 1
+        nfa.result_cache_size = 0
+
+        self.assertEqual([nfa.accepts(w) for w in words], expected, "Should have kept working after flushing the DFA.")
+        self.assertEqual(nfa.accepts_many(words), expected)
+
+    def test_result_cache_size(self):
+        words = ["ab", "aba", "ab", "aab", "aba", "ab"]
+        expected = [True, False, True, True, False, True]
+
+        nfa = NFA.from_json_file(self.copy_nfa_file())
+        nfa.result_cache_size = 2
+
+        runs = []
+        run = NFA._NFA__run
+
+        def counting_run(nfa: NFA, w: str) -> bool:
+            runs.append(w)
+
+            return run(nfa, w)
+
+        with mock.patch.object(NFA, "_NFA__run", counting_run):
+            self.assertEqual([nfa.accepts(w) for w in words], expected,
+                             "Should have kept working after dropping results.")
+            self.assertEqual(runs, ["ab", "aba", "aab", "aba", "ab"],
+                             "Should have reused results until full, then dropped them all at once.")
+
+            del runs[:]
+            long_word = "a" * 1000 + "b"
+            nfa.accepts(long_word)
+            nfa.accepts(long_word)
+
+            self.assertEqual(runs, [long_word, long_word], "Should not have remembered the result of a long word.")
+
+    def test_accepts_many(self):
+        words = ["ab", "aba", "aab", "abab", "", "aab", "invalid"]
+
+        nfa = NFA.from_json_file(NFA_FILEPATH)
+
+        self.assertEqual(nfa.accepts_many(words), [True, False, True, False, False, True, False],
+                         "Should have checked every word of the batch, in order.")
+
+    def test_from_json_file(self):
+        filepath = self.copy_nfa_file()
+        nfa = NFA.from_json_file(filepath)
+
+        self.assertIs(NFA.from_json_file(filepath), nfa, "Should have reused the NFA loaded from the unchanged file.")
+
+        modified = filepath.stat().st_mtime_ns + 1_000_000_000
+        os.utime(filepath, ns=(modified, modified))
+
+        self.assertIsNot(NFA.from_json_file(filepath), nfa, "Should have loaded the modified file again.")
+
+    def test_epsilon_closures(self):
+        s0, s1, s2 = State("s0"), State("s1"), State("s2")
+        s0.add_epsilon_transition(s1)
+        s1.add_epsilon_transition(s0)
+        s1.add_transition("a", s2)
+
+        nfa = NFA(states={s0, s1, s2}, alphabet={"a"}, initial_state=s0, accepting_states={s2})
+
+        self.assertEqual(nfa.epsilon_closures[s0], {s0, s1}, "Should have terminated on the epsilon cycle.")
+        self.assertEqual(nfa.epsilon_closures[s1], {s0, s1})
+        self.assertEqual(nfa.epsilon_closures[s2], {s2})
+        self.assertTrue(nfa.accepts("a"))
+
+    def test_accepts_without_epsilon_transitions(self):
+        s0, s1, s2 = State("s0"), State("s1"), State("s2")
+        s0.add_transition("a", s0)
+        s0.add_transition("a", s1)
+        s1.add_transition("b", s2)
+        s2.add_transition("a", s1)
+
+        nfa = NFA(states={s0, s1, s2}, alphabet={"a", "b"}, initial_state=s0, accepting_states={s2})
+
+        for w, e in [("ab", True), ("aab", True), ("abab", True), ("", False), ("a", False), ("b", False),
+                     ("abb", False), ("aba", False)]:
+            with self.subTest("Should have kept every state apart without epsilon transitions.", w=w):
+                self.assertEqual(nfa.accepts(w), e)
+
+
+class TestState(unittest.TestCase):
+    def test_id(self):
+        first, second = State("s"), State("s")
+
+        self.assertLess(first.id, second.id, "Should have numbered the states in order of creation.")
+
+    def test_get_epsilon_closure(self):
+        s0, s1, s2 = State("s0"), State("s1"), State("s2")
+        s0.add_epsilon_transition(s1)
+        s1.add_epsilon_transition(s0)
+
+        self.assertEqual(s0.get_epsilon_closure(), {s0, s1}, "Should have terminated on the epsilon cycle.")
+
+        s1.add_epsilon_transition(s2)
+
+        self.assertEqual(s0.get_epsilon_closure(), {s0, s1, s2}, "Should have invalidated the cached closure.")
+
+    def test_freeze(self):
+        s0, s1 = State("s0"), State("s1")
+        s0.add_transition("a", s1)
+        s0.freeze()
+
+        self.assertEqual(s0.transitions, {"a": (s1,)})
+        self.assertEqual(s0.epsilon_transitions, ())
+
+        with self.assertRaises(RuntimeError, msg="Should not have added a transition to a frozen state."):
+            s0.add_epsilon_transition(s1)
+
+        s2 = State("s2", epsilon_transitions=())
+        s2.add_transition("a", s1)
+
+        self.assertFalse(s2.frozen, "Should not have been frozen before freeze was called.")
@@ -1,6 +1,8 @@
 import unittest
 
-from scanner.thompson import format_regex, convert_to_postfix
+from fa import NFA, State
+from scanner.thompson import format_regex, convert_to_postfix, build_symbol_nfa, build_union_nfa, \
+    create_nfa, create_glushkov_nfa
 
 
 class TestShuntingYardAlgorithm(unittest.TestCase):
@@ -22,3 +24,83 @@ class TestShuntingYardAlgorithm(unittest.TestCase):
         for r, e in test_data:
             with self.subTest("Should have converted the regex to a postfix representation properly.", r=r, e=e):
                 self.assertEqual(convert_to_postfix(r), e)
+
+
+class TestThompsonConstruction(unittest.TestCase):
+    def test_create_nfa(self):
+        test_data = {
+            "valid_words": ["ab", "aab", "abab", "abbbab"],
+            "invalid_words": ["", "a", "b", "ba", "abc"]
+        }
+
+        nfa = create_nfa("a(a|b)*b")
+
+        self.assertEqual(nfa.alphabet, {"a", "b"})
+
+        for w in test_data["valid_words"]:
+            with self.subTest("Should have validated the word.", w=w):
+                self.assertTrue(nfa.accepts(w))
+
+        for w in test_data["invalid_words"]:
+            with self.subTest("Should not have validated the word", w=w):
+                self.assertFalse(nfa.accepts(w))
+
+    def test_create_nfa_malformed_regex(self):
+        for r in ["", "|", "a|", "(", ")", "a)", "(a"]:
+            with self.subTest("Should have rejected the malformed regex.", r=r):
+                with self.assertRaises(ValueError):
+                    create_nfa(r)
+
+    def test_create_nfa_with_literal_prefix(self):
+        nfa = create_nfa("abc(a|b)*")
+
+        for w, e in [("abc", True), ("abcab", True), ("", False), ("ab", False), ("abd", False), ("b" * 100, False),
+                     ("abcc", False)]:
+            with self.subTest("Should have checked the prefix of the word.", w=w):
+                self.assertEqual(nfa.accepts(w), e)
+
+    def test_create_glushkov_nfa(self):
+        for r in ["a(a|b)*b", "(a*b*)*c(ab)*", "ab|ac", "(a|b*)(c|a*)b*"]:
+            glushkov, thompson = create_glushkov_nfa(r), create_nfa(r)
+
+            with self.subTest("Should not have added any epsilon transition.", r=r):
+                self.assertFalse(any(s.epsilon_transitions for s in glushkov.states))
+                self.assertEqual(len(glushkov.states), sum(c.isalpha() for c in r) + 1)
+
+            for w in ["", "a", "b", "c", "ab", "ac", "abab", "abbbab", "ccab", "bcaab", "abc"]:
+                with self.subTest("Should have accepted the same words as Thompson's construction.", r=r, w=w):
+                    self.assertEqual(glushkov.accepts(w), thompson.accepts(w))
+
+    def test_create_glushkov_nfa_malformed_regex(self):
+        for r in ["", "|", "a|", "(", ")", "a)", "(a"]:
+            with self.subTest("Should have rejected the malformed regex.", r=r):
+                with self.assertRaises(ValueError):
+                    create_glushkov_nfa(r)
+
+    def test_create_nfa_builds_move_tables_lazily(self):
+        nfa = create_nfa("abc(a|b|c|d)*")
+        nfa.accepts("")
+
+        self.assertEqual(nfa._move_tables, {}, "Should not have built any move table while compiling.")
+
+        nfa.accepts("abca")
+
+        self.assertEqual(set(nfa._move_tables), {"a", "b", "c"}, "Should have built the move tables of the word only.")
+
+    def test_build_union_nfa(self):
+        nfa = build_union_nfa(build_union_nfa(build_symbol_nfa("a"), build_symbol_nfa("b")), build_symbol_nfa("c"))
+
+        for w in ["a", "b", "c"]:
+            with self.subTest("Should have accepted every alternative, despite the repeated state labels.", w=w):
+                self.assertTrue(nfa.accepts(w))
+
+        s0, s1, s2 = State("s0"), State("s1"), State("s2")
+        s0.add_transition("a", s1)
+        s0.add_transition("b", s2)
+
+        first = NFA(states={s0, s1, s2}, alphabet={"a", "b"}, initial_state=s0, accepting_states={s1, s2})
+        nfa = build_union_nfa(first, build_symbol_nfa("c"))
+
+        for w in ["a", "b", "c"]:
+            with self.subTest("Should have kept every accepting state of both alternatives.", w=w):
+                self.assertTrue(nfa.accepts(w))